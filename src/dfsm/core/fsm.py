@@ -1,22 +1,382 @@
-from typing import Any, Dict, List, Optional, Set, Tuple
+import functools
+import os
+import shutil
+import subprocess
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
-import graphviz
+from dfsm.models.fsm_model import validate_fsm, validate_outputs
 
-from dfsm.models.fsm_model import FSMModel
+# visualize(engine="auto") lays out drawings larger than this with sfdp, which
+# scales to large graphs where dot runs out of time or memory.
+_DOT_MAX_STATES = 50
+_DOT_MAX_EDGES = 150
 
+# The graphviz layout engines visualize() runs. Any other name would be looked
+# up on PATH and executed.
+_ENGINES = frozenset(
+    {"dot", "neato", "twopi", "circo", "fdp", "sfdp", "osage", "patchwork"}
+)
+
+
+def _intern(name: str) -> str:
+    """
+    Interns a state or symbol name.
+
+    Args:
+        name: the name to intern.
+
+    Returns:
+        The interned name, or name itself if it is not a plain str.
+    """
+    return sys.intern(name) if type(name) is str else name
+
+
+def _quote(identifier: str) -> str:
+    """
+    Quotes a string for use as a DOT identifier.
+
+    Args:
+        identifier: the state, symbol or label to quote.
+
+    Returns:
+        The identifier wrapped in double quotes, with inner quotes escaped.
+    """
+    escaped = identifier.replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _specialize_run(
+    state_list: List[str],
+    state_id: Dict[str, int],
+    sym_id: Dict[str, int],
+    by_state: Dict[str, Dict[str, str]],
+) -> Callable[[List[str], int], int]:
+    """
+    Builds a run function specialized to one set of transitions.
+
+    The transitions are baked into per-state dicts from input symbol to next
+    state id that the function closes over, so a step is one list index and
+    one dict lookup on the input symbol itself, with no attribute lookups and
+    no separate pass to encode the input. A missing key is either an invalid
+    symbol or an undefined transition, told apart only once it happens.
+    Building them visits only the defined transitions.
+
+    Args:
+        state_list: the states, indexed by state id.
+        state_id: the map from state to state id.
+        sym_id: the map from input symbol to symbol id.
+        by_state: the map from state to its map from input symbol to next
+            state.
+
+    Returns:
+        A function taking the input sequence and the initial state id and
+        returning the final state id.
+    """
+    rows = [
+        {
+            input_symbol: state_id[next_state]
+            for input_symbol, next_state in by_state.get(state, {}).items()
+        }
+        for state in state_list
+    ]
+
+    def run_specialized(input_sequence: List[str], current_id: int) -> int:
+        try:
+            for input_symbol in input_sequence:
+                current_id = rows[current_id][input_symbol]
+        except KeyError:
+            if input_symbol not in sym_id:
+                raise ValueError(f"Invalid input symbol: {input_symbol}") from None
+            raise ValueError(
+                f"Transition ({state_list[current_id]}, {input_symbol}) not defined"
+            ) from None
+        return current_id
+
+    return run_specialized
+
+
+@functools.lru_cache(maxsize=None)
+def _engine_path(engine: str) -> str:
+    """
+    Finds the executable of a graphviz layout engine.
+
+    The result is cached, so PATH is searched once per engine rather than
+    on every drawing.
+
+    Args:
+        engine: the graphviz layout engine, e.g. "dot".
+
+    Returns:
+        The path of the engine's executable.
+
+    Raises:
+        ValueError: If engine is not a graphviz layout engine.
+        RuntimeError: If the engine is not installed.
+    """
+    if engine not in _ENGINES:
+        raise ValueError(f"Unknown graphviz layout engine '{engine}'")
+    path = shutil.which(engine)
+    if path is None:
+        raise RuntimeError(
+            f"Graphviz layout engine '{engine}' not found; make sure the "
+            "Graphviz executables are on your PATH"
+        )
+    return path
+
+
+@functools.lru_cache(maxsize=32)
+def _render(source: str, format: str, engine: str) -> bytes:
+    """
+    Renders DOT source with graphviz.
+
+    The rendered image depends only on the arguments, so FSMs that draw the
+    same DOT source share one run of the layout engine.
+
+    Args:
+        source: the DOT source.
+        format: the graphviz output format.
+        engine: the graphviz layout engine.
+
+    Returns:
+        The rendered image.
+
+    Raises:
+        RuntimeError: If the engine is not installed or fails.
+    """
+    result = subprocess.run(
+        [_engine_path(engine), f"-T{format}"],
+        input=source.encode(),
+        capture_output=True,
+    )
+    if result.returncode:
+        error = result.stderr.decode(errors="replace").strip()
+        raise RuntimeError(f"Graphviz {engine} failed: {error}")
+    return result.stdout
+
+
+def _render_enabled(render: Optional[bool]) -> bool:
+    """
+    Resolves visualize()'s render argument.
+
+    Args:
+        render: the render argument, or None for the default.
+
+    Returns:
+        render, or by default True unless DFSM_SKIP_DOT is "1".
+    """
+    if render is None:
+        return os.environ.get("DFSM_SKIP_DOT") != "1"
+    return render
+
+
+def _draw(source: str, filename: str, format: str, engine: str, render: bool) -> None:
+    """
+    Writes an FSM drawing for visualize().
+
+    Args:
+        source: the DOT source.
+        filename: the output file name, without the format extension.
+        format: the graphviz output format.
+        engine: the graphviz layout engine.
+        render: render the image, or only write the DOT source to
+            "<filename>.dot".
+    """
+    # Missing parent directories are created, as graphviz's render() did.
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    if not render:
+        with open(f"{filename}.dot", "w", encoding="utf-8") as file:
+            file.write(source)
+        return
+
+    image = _render(source, format, engine)
+    with open(f"{filename}.{format}", "wb") as file:
+        file.write(image)
+
+
+@functools.lru_cache(maxsize=None)
+def _draw_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool visualize_async() draws in, creating it on first
+    use.
+
+    Threads are enough: the work happens in the graphviz process each
+    thread waits on.
+    """
+    return ThreadPoolExecutor(
+        max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="dfsm-draw"
+    )
+
+
+class _CompiledFSM:
+    """
+    A validated FSM structure together with the lookup tables derived from
+    it.
+
+    Outputs are not part of it: they are arbitrary caller objects, and equal
+    outputs of different types must not be shared between FSMs. Only the id
+    maps and per-state dicts are built up front. The tables for
+    running the FSM are built on first use, so FSMs that are only inspected,
+    validated or drawn never pay for them.
+    """
 
-# TODO: Extend the FSM class to include the output function to
-# behave as a Moore/Mealy machine.
-class FSM:
     def __init__(
         self,
-        states: Set[str],
-        alphabet: Set[str],
+        states: FrozenSet[str],
+        alphabet: FrozenSet[str],
         transition_functions: Dict[Tuple[str, str], str],
         initial_state: str,
-        final_states: Optional[Set[str]] = None,
-        state_outputs: Optional[Dict[str, Any]] = None,
-        transition_outputs: Optional[Dict[Tuple[str, str], Any]] = None,
+        final_states: Optional[FrozenSet[str]],
+    ) -> None:
+        """
+        Assigns state and symbol ids and builds the per-state dicts.
+
+        The arguments are the validated FSM parameters, see FSM.
+        """
+        self.states = states
+        self.alphabet = alphabet
+        self.transition_functions = transition_functions
+        self.initial_state = initial_state
+        self.final_states = final_states
+
+        # States and input symbols are mapped to integer ids once; the names
+        # are only needed again to decode results and report errors. Ids
+        # follow sorted order, so they do not depend on string hash seeds.
+        self.state_list = sorted(states)
+        self.state_id = {state: i for i, state in enumerate(self.state_list)}
+        self.sym_list = sorted(alphabet)
+        self.sym_id = {symbol: i for i, symbol in enumerate(self.sym_list)}
+
+        # Per-state rows for the string-keyed lookups in transitions(), so
+        # they hash one short string instead of a tuple.
+        self.by_state: Dict[str, Dict[str, str]] = {}
+        for (state, symbol), next_state in transition_functions.items():
+            self.by_state.setdefault(state, {})[symbol] = next_state
+
+    @functools.cached_property
+    def table(self) -> "List[bytearray] | List[array[int]]":
+        """
+        The transition table, indexed by state id and symbol id.
+
+        Each step is an index into a row of unsigned C ints instead of
+        hashing a (state, symbol) tuple. Typical FSMs fit a bytearray row, one
+        byte per transition. Undefined transitions hold the id one past the
+        last state.
+        """
+        n_states = len(self.state_list)
+        n_symbols = len(self.sym_list)
+        table: "List[bytearray] | List[array[int]]"
+        if n_states <= 0xFF:
+            table = [bytearray([n_states]) * n_symbols for _ in self.state_list]
+        else:
+            typecode = "H" if n_states <= 0xFFFF else "L"
+            table = [array(typecode, [n_states]) * n_symbols for _ in self.state_list]
+        state_id = self.state_id
+        sym_id = self.sym_id
+        for (state, symbol), next_state in self.transition_functions.items():
+            table[state_id[state]][sym_id[symbol]] = state_id[next_state]
+        return table
+
+    @functools.cached_property
+    def run_specialized(self) -> Callable[[List[str], int], int]:
+        """The run function specialized to the transitions."""
+        return _specialize_run(
+            self.state_list, self.state_id, self.sym_id, self.by_state
+        )
+
+
+@functools.lru_cache(maxsize=128)
+def _compile(
+    states: FrozenSet[str],
+    alphabet: FrozenSet[str],
+    transition_functions: FrozenSet[Tuple[Tuple[str, str], str]],
+    initial_state: str,
+    final_states: Optional[FrozenSet[str]],
+) -> _CompiledFSM:
+    """
+    Validates an FSM structure and builds the tables used to run it.
+
+    The arguments are the frozen FSM parameters other than the outputs, so
+    structurally identical FSMs share one validation pass and one set of
+    tables.
+
+    Returns:
+        The validated definition and its lookup tables.
+
+    Raises:
+        ValueError: If the FSM definition is not valid.
+    """
+    # State and symbol names are interned, so the tables and any lookup with
+    # an interned name (such as a string literal) match by identity instead
+    # of comparing characters.
+    states = frozenset(map(_intern, states))
+    alphabet = frozenset(map(_intern, alphabet))
+    transitions = {
+        (_intern(state), _intern(symbol)): _intern(next_state)
+        for (state, symbol), next_state in dict(transition_functions).items()
+    }
+    initial_state = _intern(initial_state)
+    if final_states is not None:
+        final_states = frozenset(map(_intern, final_states))
+
+    # Validated directly from the parameters; building an FSMModel first
+    # would only copy them into a frozen dataclass.
+    validate_fsm(states, alphabet, transitions, initial_state, final_states)
+
+    return _CompiledFSM(states, alphabet, transitions, initial_state, final_states)
+
+
+class FSM:
+    # No per-instance __dict__: FSMs are smaller and attribute loads go
+    # through slot descriptors.
+    __slots__ = (
+        "states",
+        "alphabet",
+        "transition_functions",
+        "initial_state",
+        "final_states",
+        "state_outputs",
+        "transition_outputs",
+        "_state_list",
+        "_state_id",
+        "_initial_id",
+        "_sym_list",
+        "_sym_id",
+        "_by_state",
+        "_trans_out_by_state",
+        "_state_out_list",
+        "_out_table",
+        "_compiled",
+        "_dot_sources",
+    )
+
+    def __init__(
+        self,
+        states: AbstractSet[str],
+        alphabet: AbstractSet[str],
+        transition_functions: Mapping[Tuple[str, str], str],
+        initial_state: str,
+        final_states: Optional[AbstractSet[str]] = None,
+        state_outputs: Optional[Mapping[str, Any]] = None,
+        transition_outputs: Optional[Mapping[Tuple[str, str], Any]] = None,
+        minimize: bool = False,
     ):
         """
         Initialize the FSM with the given parameters.
@@ -31,27 +391,113 @@ class FSM:
             state_outputs: the dictionary containing the output for each state.
             transition_outputs: the dictionary containing the output for each
                 transition.
+            minimize: replace the FSM with its minimal equivalent, see
+                minimize().
+
+        State and symbol names are interned for faster lookups, so they are
+        best kept short and reused rather than built per call.
         """
-        fsm_model = FSMModel(
-            states=states,
-            alphabet=alphabet,
-            transition_functions=transition_functions,
-            initial_state=initial_state,
-            final_states=final_states,
-            state_outputs=state_outputs,
-            transition_outputs=transition_outputs,
+        if minimize:
+            minimal = FSM(
+                states,
+                alphabet,
+                transition_functions,
+                initial_state,
+                final_states,
+                state_outputs,
+                transition_outputs,
+            ).minimize()
+            states = minimal.states
+            transition_functions = minimal.transition_functions
+            final_states = minimal.final_states
+            state_outputs = minimal.state_outputs
+            transition_outputs = minimal.transition_outputs
+
+        compiled = _compile(
+            frozenset(states),
+            frozenset(alphabet),
+            frozenset(transition_functions.items()),
+            initial_state,
+            None if final_states is None else frozenset(final_states),
+        )
+        validate_outputs(
+            compiled.states, compiled.alphabet, state_outputs, transition_outputs
+        )
+
+        # The compiled FSM is shared between cached FSMs. Its sets are frozen
+        # and can be shared too. The dicts are exposed as read-only views:
+        # every method reads the tables built from them, so they must not
+        # change after construction.
+        self.states: FrozenSet[str] = compiled.states
+        self.alphabet: FrozenSet[str] = compiled.alphabet
+        self.transition_functions: Mapping[Tuple[str, str], str] = MappingProxyType(
+            compiled.transition_functions
+        )
+        self.initial_state: str = compiled.initial_state
+        self.final_states: Optional[FrozenSet[str]] = compiled.final_states
+        # Outputs are kept per FSM, with their keys interned like the names
+        # in the compiled tables.
+        self.state_outputs: Optional[Mapping[str, Any]] = (
+            None
+            if state_outputs is None
+            else MappingProxyType(
+                {_intern(state): output for state, output in state_outputs.items()}
+            )
+        )
+        self.transition_outputs: Optional[Mapping[Tuple[str, str], Any]] = (
+            None
+            if transition_outputs is None
+            else MappingProxyType(
+                {
+                    (_intern(state), _intern(symbol)): output
+                    for (state, symbol), output in transition_outputs.items()
+                }
+            )
         )
 
-        # Validate the FSM model.
-        fsm_model.validate_transitions()
+        self._state_list = compiled.state_list
+        self._state_id = compiled.state_id
+        self._initial_id = compiled.state_id[self.initial_state]
+        self._sym_list = compiled.sym_list
+        self._sym_id = compiled.sym_id
+        self._by_state = compiled.by_state
+        # Per-state rows for get_output(), as for transitions().
+        self._trans_out_by_state: Dict[str, Dict[str, Any]] = {}
+        for (state, symbol), output in (self.transition_outputs or {}).items():
+            self._trans_out_by_state.setdefault(state, {})[symbol] = output
+        if self.state_outputs:
+            self._state_out_list: List[Any] = [
+                self.state_outputs.get(state) for state in compiled.state_list
+            ]
+        else:
+            self._state_out_list = [None] * len(compiled.state_list)
+        self._out_table: Optional[List[List[Any]]] = None
+        self._compiled = compiled
+        self._dot_sources: Dict[bool, str] = {}
 
-        self.states = fsm_model.states
-        self.alphabet = fsm_model.alphabet
-        self.transition_functions = fsm_model.transition_functions
-        self.initial_state = fsm_model.initial_state
-        self.final_states = fsm_model.final_states
-        self.state_outputs = fsm_model.state_outputs
-        self.transition_outputs = fsm_model.transition_outputs
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """
+        Pickles and copies the FSM as its constructor arguments.
+
+        The read-only views and the shared compiled tables cannot be pickled
+        themselves, and are rebuilt from the arguments instead.
+        """
+        return (
+            FSM,
+            (
+                self.states,
+                self.alphabet,
+                dict(self.transition_functions),
+                self.initial_state,
+                self.final_states,
+                None if self.state_outputs is None else dict(self.state_outputs),
+                (
+                    None
+                    if self.transition_outputs is None
+                    else dict(self.transition_outputs)
+                ),
+            ),
+        )
 
     def transitions(self, state: str, input_symbol: str) -> str:
         """
@@ -68,8 +514,10 @@ class FSM:
             ValueError: If the state and input symbol are not in the
                 transition function.
         """
+        # Two lookups on the names themselves. The integer table would need
+        # both names mapped to ids first and the result decoded back.
         try:
-            return self.transition_functions[(state, input_symbol)]
+            return self._by_state[state][input_symbol]
         except KeyError:
             raise ValueError(f"Transition ({state}, {input_symbol}) not defined")
 
@@ -99,61 +547,473 @@ class FSM:
 
     def get_output(self, state: str, input_symbol: Optional[str] = None) -> Any:
         """
-        Returns the output for the given state (Moore) or transition (Mealy).
-        Mealy machines take precedence when both input_symbol and
-        transition_outputs are provided.
+        Returns the output for the given transition (Mealy) when input_symbol
+        is provided, otherwise the output for the given state (Moore).
+        Outputs that are not configured are None.
         """
-        if self.transition_outputs and input_symbol is not None:
-            return self.transition_outputs.get((state, input_symbol))
-        elif self.state_outputs:
-            return self.state_outputs.get(state)
-        return None
+        if input_symbol is not None:
+            row = self._trans_out_by_state.get(state)
+            return row.get(input_symbol) if row else None
+        state_id = self._state_id.get(state)
+        return None if state_id is None else self._state_out_list[state_id]
 
     def run(self, input_sequence: List[str], collect_outputs: bool = False) -> Any:
         """
         Runs the FSM with the given input sequence. Optionally collects outputs.
         Returns: the final state or (final state, outputs) if collect_outputs is True.
         """
-        current_state = self.initial_state
-        outputs = []
+        if not collect_outputs:
+            return self._state_list[
+                self._compiled.run_specialized(input_sequence, self._initial_id)
+            ]
+
+        # Validate and encode the whole sequence up front; the stepping loop
+        # below then needs no per-symbol checks.
+        symbol_ids = self._encode_inputs(input_sequence)
+
+        table = self._compiled.table
+        undefined = len(self._state_list)
+        current_id = self._initial_id
+        out_table = self._output_table()
+        # A bound append is faster here than index assignment into a
+        # preallocated list: list growth is amortized, while tracking the
+        # index costs an enumerate() tuple per step.
+        outputs: List[Any] = []
+        outputs_append = outputs.append
+        for symbol_id in symbol_ids:
+            next_id = table[current_id][symbol_id]
+            if next_id == undefined:
+                raise self._undefined_transition(current_id, symbol_id)
+            outputs_append(out_table[current_id][symbol_id])
+            current_id = next_id
+        # Optionally add Moore output for final state
+        outputs_append(self._state_out_list[current_id])
+        return self._state_list[current_id], outputs
+
+    def run_iter(self, input_sequence: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """
+        Runs the FSM lazily, yielding each state together with its output.
+
+        Nothing is collected, so arbitrarily long inputs, including
+        generators, run in constant memory.
+
+        Args:
+            input_sequence: the input symbols.
+
+        Yields:
+            (state, output) for the state each input symbol is read in, then
+            (final state, final state output). The outputs are the ones
+            run(collect_outputs=True) returns.
+
+        Raises:
+            ValueError: If an input symbol is invalid or reaches an undefined
+                transition.
+        """
+        state_list = self._state_list
+        sym_id = self._sym_id
+        table = self._compiled.table
+        undefined = len(state_list)
+        out_table = self._output_table()
+        current_id = self._initial_id
         for input_symbol in input_sequence:
-            if not self._is_valid_input(input_symbol):
+            symbol_id = sym_id.get(input_symbol)
+            if symbol_id is None:
                 raise ValueError(f"Invalid input symbol: {input_symbol}")
-            if not self._is_valid_state(current_state):
-                raise ValueError(f"Invalid state: {current_state}")
-            output = self.get_output(current_state, input_symbol)
-            if collect_outputs:
-                outputs.append(output)
-            current_state = self.transitions(current_state, input_symbol)
-        if collect_outputs:
-            # Optionally add Moore output for final state
-            outputs.append(self.get_output(current_state))
-            return current_state, outputs
-        return current_state
-
-    def visualize(self, filename: str, format: str = "png") -> None:
+            next_id = table[current_id][symbol_id]
+            if next_id == undefined:
+                raise self._undefined_transition(current_id, symbol_id)
+            yield state_list[current_id], out_table[current_id][symbol_id]
+            current_id = next_id
+        yield state_list[current_id], self._state_out_list[current_id]
+
+    def _output_table(self) -> List[List[Any]]:
+        """
+        Returns the output emitted on each step, indexed by state id and
+        symbol id, building it on first use.
+
+        Transition outputs when any are defined, else the state output of
+        the state the step is taken from.
+        """
+        if self._out_table is not None:
+            return self._out_table
+        n_symbols = len(self._sym_list)
+        if not self.transition_outputs:
+            out_table = [[output] * n_symbols for output in self._state_out_list]
+        else:
+            out_table = [[None] * n_symbols for _ in self._state_list]
+            for (state, symbol), output in self.transition_outputs.items():
+                out_table[self._state_id[state]][self._sym_id[symbol]] = output
+        self._out_table = out_table
+        return out_table
+
+    def _encode_inputs(self, input_sequence: Iterable[str]) -> List[int]:
+        """
+        Encodes input symbols into symbol ids.
+
+        Args:
+            input_sequence: the input symbols.
+
+        Returns:
+            The symbol id of each input symbol.
+
+        Raises:
+            ValueError: If an input symbol is not in the alphabet.
+        """
+        sym_id = self._sym_id
+        try:
+            return [sym_id[input_symbol] for input_symbol in input_sequence]
+        except KeyError as error:
+            raise ValueError(f"Invalid input symbol: {error.args[0]}") from None
+
+    def _undefined_transition(self, state_id: int, symbol_id: int) -> ValueError:
+        """
+        Builds the error raised when run() reaches an undefined transition.
+
+        Args:
+            state_id: the id of the current state.
+            symbol_id: the id of the input symbol.
+
+        Returns:
+            The ValueError to raise.
+        """
+        return ValueError(
+            f"Transition ({self._state_list[state_id]}, "
+            f"{self._sym_list[symbol_id]}) not defined"
+        )
+
+    def run_batch(self, input_sequences: List[List[str]]) -> List[str]:
+        """
+        Runs the FSM over several independent input sequences.
+
+        Args:
+            input_sequences: the input sequences to run.
+
+        Returns:
+            The final state of each input sequence.
+
+        Raises:
+            ValueError: If a sequence has an invalid input symbol or reaches
+                an undefined transition.
+        """
+        return [self.run(input_sequence) for input_sequence in input_sequences]
+
+    def _reachable_states(self) -> Set[str]:
+        """
+        Finds the states reachable from the initial state.
+
+        Returns:
+            The set of states reachable from the initial state, including it.
+        """
+        reachable = {self.initial_state}
+        queue = deque([self.initial_state])
+        by_state = self._by_state
+        while queue:
+            for next_state in by_state.get(queue.popleft(), {}).values():
+                if next_state not in reachable:
+                    reachable.add(next_state)
+                    queue.append(next_state)
+        return reachable
+
+    def minimize(self) -> "FSM":
+        """
+        Builds the minimal FSM equivalent to this one.
+
+        Unreachable states are dropped and equivalent states are merged using
+        Hopcroft's partition refinement. States are equivalent when they agree
+        on being final, on their state output, and on which transitions they
+        define and those transitions' outputs, and their transitions lead to
+        equivalent states. Each merged block keeps the name of its smallest
+        state, or of the initial state if it contains it.
+
+        Returns:
+            The minimal equivalent FSM.
+        """
+        # Transitions and their outputs are read from the per-state rows, the
+        # same tables run() uses.
+        reachable = self._reachable_states()
+        symbols = self._sym_list
+        final_states = self.final_states or frozenset()
+        by_state = self._by_state
+        trans_out_by_state = self._trans_out_by_state
+        state_out_list = self._state_out_list
+        state_id = self._state_id
+
+        # Outputs enter the signatures below as small ints. Outputs are equal
+        # when they have the same type and compare equal, so 1 and True stay
+        # apart; unhashable outputs are matched by a scan over those seen.
+        output_ids: Dict[Tuple[type, Any], int] = {}
+        unhashable_outputs: List[Tuple[Any, int]] = []
+
+        def output_id(output: Any) -> int:
+            try:
+                return output_ids.setdefault(
+                    (type(output), output), len(output_ids) + len(unhashable_outputs)
+                )
+            except TypeError:
+                for seen, seen_id in unhashable_outputs:
+                    if type(seen) is type(output) and seen == output:
+                        return seen_id
+                new_id = len(output_ids) + len(unhashable_outputs)
+                unhashable_outputs.append((output, new_id))
+                return new_id
+
+        # Initial partition: states that differ in anything observable.
+        initial_blocks: Dict[Tuple[Any, ...], Set[str]] = {}
+        for state in reachable:
+            row = by_state.get(state, {})
+            out_row = trans_out_by_state.get(state, {})
+            signature = (
+                state in final_states,
+                output_id(state_out_list[state_id[state]]),
+                tuple(
+                    (symbol in row, output_id(out_row.get(symbol)))
+                    for symbol in symbols
+                ),
+            )
+            initial_blocks.setdefault(signature, set()).add(state)
+        blocks = list(initial_blocks.values())
+        block_of = {state: i for i, block in enumerate(blocks) for state in block}
+
+        # predecessors[symbol][state]: the states moving to state on symbol.
+        predecessors: Dict[str, Dict[str, Set[str]]] = {
+            symbol: {} for symbol in symbols
+        }
+        for state in reachable:
+            for symbol, next_state in by_state.get(state, {}).items():
+                predecessors[symbol].setdefault(next_state, set()).add(state)
+
+        pending = {(i, symbol) for i in range(len(blocks)) for symbol in symbols}
+        worklist = deque(pending)
+        while worklist:
+            splitter = worklist.popleft()
+            pending.discard(splitter)
+            block_index, symbol = splitter
+            incoming = predecessors[symbol]
+            moving_in: Dict[int, Set[str]] = {}
+            for state in blocks[block_index]:
+                for predecessor in incoming.get(state, ()):
+                    moving_in.setdefault(block_of[predecessor], set()).add(predecessor)
+            for split_index, inside in moving_in.items():
+                if len(inside) == len(blocks[split_index]):
+                    continue
+                outside = blocks[split_index] - inside
+                blocks[split_index] = inside
+                new_index = len(blocks)
+                blocks.append(outside)
+                for state in outside:
+                    block_of[state] = new_index
+                for other_symbol in symbols:
+                    if (split_index, other_symbol) in pending:
+                        added = (new_index, other_symbol)
+                    elif len(inside) <= len(outside):
+                        added = (split_index, other_symbol)
+                    else:
+                        added = (new_index, other_symbol)
+                    pending.add(added)
+                    worklist.append(added)
+
+        names = [
+            self.initial_state if self.initial_state in block else min(block)
+            for block in blocks
+        ]
+        rename = {state: names[block_of[state]] for state in reachable}
+        minimal_transitions = {
+            (rename[state], symbol): rename[next_state]
+            for state in reachable
+            for symbol, next_state in by_state.get(state, {}).items()
+        }
+        minimal_outputs: Optional[Dict[Tuple[str, str], Any]] = None
+        if self.transition_outputs is not None:
+            minimal_outputs = {
+                (rename[state], symbol): output
+                for state in reachable
+                for symbol, output in trans_out_by_state.get(state, {}).items()
+            }
+            if self.transition_outputs and not minimal_outputs:
+                # Only unreachable states had transition outputs. Steps still
+                # output None rather than falling back to state outputs.
+                minimal_outputs = dict.fromkeys(minimal_transitions)
+        return FSM(
+            states=set(names),
+            alphabet=self.alphabet,
+            transition_functions=minimal_transitions,
+            initial_state=self.initial_state,
+            final_states=(
+                None
+                if self.final_states is None
+                else {rename[state] for state in self.final_states if state in rename}
+            ),
+            state_outputs=(
+                None
+                if self.state_outputs is None
+                else {
+                    rename[state]: output
+                    for state, output in self.state_outputs.items()
+                    if state in rename
+                }
+            ),
+            transition_outputs=minimal_outputs,
+        )
+
+    def visualize(
+        self,
+        filename: str,
+        format: str = "png",
+        reachable_only: bool = True,
+        engine: str = "auto",
+        render: Optional[bool] = None,
+    ) -> None:
         """
         Visualizes the FSM using graphviz.
+
+        Args:
+            filename: the output file name, without the format extension.
+            format: the graphviz output format.
+            reachable_only: only draw the states reachable from the initial
+                state, and the transitions between them.
+            engine: the graphviz layout engine. "auto" picks "dot", or
+                "sfdp" when more than 50 states or 150 edges are drawn, as
+                dot copes badly with large graphs.
+            render: run graphviz to draw the image. When False, only the DOT
+                source is written, to "<filename>.dot", without starting a
+                graphviz process. Defaults to True unless the DFSM_SKIP_DOT
+                environment variable is "1".
+
+        Raises:
+            ValueError: If engine is not "auto" or a graphviz layout engine.
+        """
+        _draw(
+            self._dot_source(reachable_only),
+            filename,
+            format,
+            self._select_engine(engine, reachable_only),
+            _render_enabled(render),
+        )
+
+    def visualize_async(
+        self,
+        filename: str,
+        format: str = "png",
+        reachable_only: bool = True,
+        engine: str = "auto",
+        render: Optional[bool] = None,
+    ) -> "Future[None]":
+        """
+        Same as visualize(), but draws the FSM in a background thread.
+
+        Graphviz lays out and renders in its own process, so several FSMs
+        drawn this way are rendered concurrently.
+
+        Returns:
+            A future that completes, or raises visualize()'s errors, once the
+            file is written.
+        """
+        return _draw_executor().submit(
+            _draw,
+            self._dot_source(reachable_only),
+            filename,
+            format,
+            self._select_engine(engine, reachable_only),
+            _render_enabled(render),
+        )
+
+    def _select_engine(self, engine: str, reachable_only: bool) -> str:
+        """
+        Resolves visualize()'s engine argument.
+
+        Args:
+            engine: the graphviz layout engine, or "auto".
+            reachable_only: only count the states reachable from the
+                initial state, and the transitions between them.
+
+        Returns:
+            engine, or for "auto" "dot" for small drawings and "sfdp" for
+            large ones.
+
+        Raises:
+            ValueError: If engine is not "auto" or a graphviz layout engine.
+        """
+        if engine != "auto":
+            if engine not in _ENGINES:
+                raise ValueError(f"Unknown graphviz layout engine '{engine}'")
+            return engine
+        states = self._reachable_states() if reachable_only else self.states
+        # Parallel transitions are drawn as one edge.
+        by_state = self._by_state
+        edges = {
+            (state, next_state)
+            for state in states
+            for next_state in by_state.get(state, {}).values()
+        }
+        if len(states) <= _DOT_MAX_STATES and len(edges) <= _DOT_MAX_EDGES:
+            return "dot"
+        return "sfdp"
+
+    def _dot_source(self, reachable_only: bool) -> str:
         """
-        dot = graphviz.Digraph(format=format)
+        Builds the DOT source drawn by visualize().
+
+        The source is emitted as one string rather than through a
+        graphviz.Digraph call per node and edge, and is cached per FSM so
+        rendering again, e.g. in another format, does not rebuild it.
+
+        Args:
+            reachable_only: only include the states reachable from the
+                initial state, and the transitions between them.
+
+        Returns:
+            The DOT source.
+        """
+        if reachable_only in self._dot_sources:
+            return self._dot_sources[reachable_only]
+
+        states = self._reachable_states() if reachable_only else self.states
+        # States in sorted order, the initial state first, so equal FSMs give
+        # identical sources whatever the set iteration order.
+        initial_state = self.initial_state
+        ordered = [initial_state]
+        ordered.extend(
+            state
+            for state in self._state_list
+            if state in states and state != initial_state
+        )
+
+        # Only states with an output or a final marker need attributes; the
+        # others are drawn with the default circle labelled by their name.
+        # Without outputs or final states both loops are skipped entirely.
+        attributes: Dict[str, List[str]] = {}
+        for state, output in (self.state_outputs or {}).items():
+            if state in states:
+                label = _quote(f"{state}/ {output}")
+                attributes.setdefault(state, []).append(f"label={label}")
+        for state in self.final_states or ():
+            if state in states:
+                attributes.setdefault(state, []).append("shape=doublecircle")
+
         # Initial state arrow
-        dot.attr("node", shape="none")
-        dot.node("start", label="")
-        dot.attr("node", shape="circle")
-        for state in self.states:
-            shape = (
-                "doublecircle"
-                if self.final_states and state in self.final_states
-                else "circle"
-            )
-            label = state
-            if self.state_outputs and state in self.state_outputs:
-                label += f"/ {self.state_outputs[state]}"
-            dot.node(state, label=label, shape=shape)
-        dot.edge("start", self.initial_state)
-        for (state, symbol), next_state in self.transition_functions.items():
-            label = symbol
-            if self.transition_outputs and (state, symbol) in self.transition_outputs:
-                label += f"/ {self.transition_outputs[(state, symbol)]}"
-            dot.edge(state, next_state, label=label)
-        dot.render(filename, view=False, cleanup=True)
+        lines = ["digraph {", "\tnode [shape=none]", '\tstart [label=""]']
+        lines.append("\tnode [shape=circle]")
+        for state in ordered:
+            if state in attributes:
+                lines.append(f"\t{_quote(state)} [{' '.join(attributes[state])}]")
+            else:
+                lines.append(f"\t{_quote(state)}")
+        lines.append(f"\tstart -> {_quote(initial_state)}")
+
+        # Parallel transitions between the same two states are drawn as one
+        # edge labelled with all their symbols; layout time grows with the
+        # number of edges.
+        edge_labels: Dict[Tuple[str, str], List[str]] = {}
+        trans_out_by_state = self._trans_out_by_state
+        for state in ordered:
+            out_row = trans_out_by_state.get(state, {})
+            for symbol, next_state in sorted(self._by_state.get(state, {}).items()):
+                edge_labels.setdefault((state, next_state), []).append(
+                    f"{symbol}/ {out_row[symbol]}" if symbol in out_row else symbol
+                )
+        for (state, next_state), labels in edge_labels.items():
+            label = _quote(", ".join(labels))
+            lines.append(f"\t{_quote(state)} -> {_quote(next_state)} [label={label}]")
+        lines.append("}\n")
+        source = self._dot_sources[reachable_only] = "\n".join(lines)
+        return source
@@ -1,26 +1,152 @@
-from typing import Dict, Optional, Set, Tuple
-
-from pydantic import BaseModel, Field
-
-
-class FSMModel(BaseModel):
-    states: Set[str] = Field(..., min_length=1, description="The set of states")
-    alphabet: Set[str] = Field(
-        ..., min_length=1, description="The set of input symbols"
-    )
-    transition_functions: Dict[Tuple[str, str], str] = Field(
-        ..., description="The transition functions"
-    )
-    initial_state: str = Field(..., min_length=1, description="The initial state")
-    final_states: Optional[Set[str]] = Field(
-        None, description="The set of final states"
-    )
-    state_outputs: Optional[Dict[str, str]] = Field(
-        None, description="Moore machine outputs: state -> output"
-    )
-    transition_outputs: Optional[Dict[Tuple[str, str], str]] = Field(
-        None, description="Mealy machine outputs: (state, input) -> output"
-    )
+from dataclasses import dataclass
+from typing import AbstractSet, Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+
+def _freeze(items: AbstractSet[str]) -> FrozenSet[str]:
+    """Returns items as a frozenset, without copying one that already is."""
+    return items if isinstance(items, frozenset) else frozenset(items)
+
+
+def _check_required(
+    states: AbstractSet[str], alphabet: AbstractSet[str], initial_state: str
+) -> None:
+    """
+    Checks that the required FSM fields are not empty.
+
+    Raises:
+        ValueError: If states, alphabet or initial_state is empty.
+    """
+    if not states:
+        raise ValueError("States set must not be empty")
+    if not alphabet:
+        raise ValueError("Alphabet must not be empty")
+    if not initial_state:
+        raise ValueError("Initial state must not be empty")
+
+
+def validate_fsm(
+    states: AbstractSet[str],
+    alphabet: AbstractSet[str],
+    transition_functions: Dict[Tuple[str, str], str],
+    initial_state: str,
+    final_states: Optional[AbstractSet[str]] = None,
+    state_outputs: Optional[Dict[str, Any]] = None,
+    transition_outputs: Optional[Dict[Tuple[str, str], Any]] = None,
+) -> None:
+    """
+    Validates an FSM definition without building an FSMModel.
+
+    Runs the checks of FSMModel's constructor and of validate_transitions(),
+    with the same error messages.
+
+    Args:
+        states: the set of states.
+        alphabet: the set of input symbols.
+        transition_functions: the transition functions.
+        initial_state: the initial state.
+        final_states: the set of final states.
+        state_outputs: Moore machine outputs: state -> output.
+        transition_outputs: Mealy machine outputs: (state, input) -> output.
+
+    Raises:
+        ValueError: If the FSM definition is not valid.
+    """
+    _check_required(states, alphabet, initial_state)
+
+    # One sweep over the transitions. Final states and state outputs are
+    # checked with a C-level set difference.
+    for (state, symbol), next_state in transition_functions.items():
+        if state not in states:
+            raise ValueError(f"State '{state}' in transition not in states set")
+        if next_state not in states:
+            raise ValueError(f"Next state '{next_state}' not in states set")
+        if symbol not in alphabet:
+            raise ValueError(f"Symbol '{symbol}' not in alphabet")
+
+    if initial_state not in states:
+        raise ValueError(f"Initial state '{initial_state}' not in states set")
+
+    if final_states:
+        for state in final_states - states:
+            raise ValueError(f"Final state '{state}' not in states set")
+
+    validate_outputs(states, alphabet, state_outputs, transition_outputs)
+
+
+def validate_outputs(
+    states: AbstractSet[str],
+    alphabet: AbstractSet[str],
+    state_outputs: Optional[Mapping[str, Any]] = None,
+    transition_outputs: Optional[Mapping[Tuple[str, str], Any]] = None,
+) -> None:
+    """
+    Validates the outputs of an FSM definition against its states and
+    alphabet.
+
+    Args:
+        states: the set of states.
+        alphabet: the set of input symbols.
+        state_outputs: Moore machine outputs: state -> output.
+        transition_outputs: Mealy machine outputs: (state, input) -> output.
+
+    Raises:
+        ValueError: If an output refers to an unknown state or symbol.
+    """
+    if state_outputs:
+        for state in state_outputs.keys() - states:
+            raise ValueError(f"State '{state}' in state_outputs not in states set")
+
+    if transition_outputs:
+        for state, symbol in transition_outputs:
+            if state not in states:
+                raise ValueError(
+                    f"State '{state}' in transition_outputs not in states set"
+                )
+            if symbol not in alphabet:
+                raise ValueError(
+                    f"Symbol '{symbol}' in transition_outputs not in alphabet"
+                )
+
+
+@dataclass(frozen=True, slots=True)
+class FSMModel:
+    """
+    The definition of an FSM.
+
+    Attributes:
+        states: the set of states.
+        alphabet: the set of input symbols.
+        transition_functions: the transition functions.
+        initial_state: the initial state.
+        final_states: the set of final states.
+        state_outputs: Moore machine outputs: state -> output.
+        transition_outputs: Mealy machine outputs: (state, input) -> output.
+    """
+
+    states: FrozenSet[str]
+    alphabet: FrozenSet[str]
+    transition_functions: Dict[Tuple[str, str], str]
+    initial_state: str
+    final_states: Optional[FrozenSet[str]] = None
+    state_outputs: Optional[Dict[str, str]] = None
+    transition_outputs: Optional[Dict[Tuple[str, str], str]] = None
+
+    def __post_init__(self) -> None:
+        """
+        Freezes the set fields and checks that the required fields are not
+        empty.
+
+        Raises:
+            ValueError: If states, alphabet or initial_state is empty.
+        """
+        # Frozen sets are hashable and cache their hash, and can be shared
+        # between FSMs without defensive copies.
+        object.__setattr__(self, "states", _freeze(self.states))
+        object.__setattr__(self, "alphabet", _freeze(self.alphabet))
+        if self.final_states is not None:
+            object.__setattr__(self, "final_states", _freeze(self.final_states))
+
+        _check_required(self.states, self.alphabet, self.initial_state)
 
     def validate_transitions(self) -> None:
         """
@@ -35,36 +161,12 @@ class FSMModel(BaseModel):
         Raises:
             ValueError: If the transition function is not valid.
         """
-        for (state, symbol), next_state in self.transition_functions.items():
-            if state not in self.states:
-                raise ValueError(f"State '{state}' in transition not in states set")
-            if next_state not in self.states:
-                raise ValueError(f"Next state '{next_state}' not in states set")
-            if symbol not in self.alphabet:
-                raise ValueError(f"Symbol '{symbol}' not in alphabet")
-
-        if self.initial_state not in self.states:
-            raise ValueError(f"Initial state '{self.initial_state}' not in states set")
-
-        if self.final_states:
-            for state in self.final_states:
-                if state not in self.states:
-                    raise ValueError(f"Final state '{state}' not in states set")
-
-        if self.state_outputs:
-            for state in self.state_outputs:
-                if state not in self.states:
-                    raise ValueError(
-                        f"State '{state}' in state_outputs not in states set"
-                    )
-
-        if self.transition_outputs:
-            for state, symbol in self.transition_outputs:
-                if state not in self.states:
-                    raise ValueError(
-                        f"State '{state}' in transition_outputs not in states set"
-                    )
-                if symbol not in self.alphabet:
-                    raise ValueError(
-                        f"Symbol '{symbol}' in transition_outputs not in alphabet"
-                    )
+        validate_fsm(
+            self.states,
+            self.alphabet,
+            self.transition_functions,
+            self.initial_state,
+            self.final_states,
+            self.state_outputs,
+            self.transition_outputs,
+        )
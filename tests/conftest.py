@@ -0,0 +1,15 @@
+"""Shared pytest configuration."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Make the package importable from the source tree, once for all test modules.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture(autouse=True)  # type: ignore[misc]
+def skip_dot(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Write DOT sources instead of running graphviz in visualize()."""
+    monkeypatch.setenv("DFSM_SKIP_DOT", "1")
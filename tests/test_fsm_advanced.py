@@ -1,16 +1,14 @@
 """Advanced tests for Moore/Mealy machine features and visualization."""
 
 import os
-import sys
+import shutil
+import subprocess
 import tempfile
+from typing import Any, Dict, List
 
 import pytest
 
-# Add src to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
-# Import after path modification
-from dfsm.core.fsm import FSM  # noqa: E402
+from dfsm.core.fsm import FSM, _engine_path, _render
 
 
 class TestMooreMachine:
@@ -116,6 +114,243 @@ class TestMealyMachine:
         assert outputs == ["X", "W", "Z", None]  # Transitions + final (no Moore output)
 
 
+class TestRunIter:
+    """Test lazily running an FSM."""
+
+    def test_run_iter_matches_run(self) -> None:
+        """Test run_iter yields the states and outputs run() collects."""
+        fsm = FSM(
+            states={"A", "B", "C"},
+            alphabet={"0", "1"},
+            transition_functions={
+                ("A", "0"): "B",
+                ("A", "1"): "C",
+                ("B", "0"): "C",
+                ("B", "1"): "A",
+                ("C", "0"): "A",
+                ("C", "1"): "B",
+            },
+            initial_state="A",
+            state_outputs={"A": "Alpha", "B": "Beta", "C": "Gamma"},
+        )
+
+        steps = list(fsm.run_iter(iter(["0", "1", "0"])))
+        assert steps == [("A", "Alpha"), ("B", "Beta"), ("A", "Alpha"), ("B", "Beta")]
+        assert fsm.run(["0", "1", "0"], collect_outputs=True) == (
+            steps[-1][0],
+            [output for _, output in steps],
+        )
+
+    def test_run_iter_invalid_symbol(self) -> None:
+        """Test run_iter raises once it reaches an invalid symbol."""
+        fsm = FSM(
+            states={"A"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "A"},
+            initial_state="A",
+        )
+
+        steps = fsm.run_iter(["0", "x"])
+        assert next(steps) == ("A", None)
+        with pytest.raises(ValueError, match="Invalid input symbol: x"):
+            next(steps)
+
+
+class TestRunBatch:
+    """Test running several input sequences at once."""
+
+    @pytest.fixture  # type: ignore[misc]
+    def parity_fsm(self) -> FSM:
+        """Fixture for an FSM tracking the parity of 1s."""
+        return FSM(
+            states={"Even", "Odd"},
+            alphabet={"0", "1"},
+            transition_functions={
+                ("Even", "0"): "Even",
+                ("Even", "1"): "Odd",
+                ("Odd", "0"): "Odd",
+                ("Odd", "1"): "Even",
+            },
+            initial_state="Even",
+        )
+
+    def test_run_batch_matches_run(self, parity_fsm: FSM) -> None:
+        """Test batch results match running each sequence on its own."""
+        sequences = [["0", "1", "1"], ["1", "0", "0"], ["1", "1", "1"]]
+        assert parity_fsm.run_batch(sequences) == [
+            parity_fsm.run(sequence) for sequence in sequences
+        ]
+
+    def test_run_batch_ragged_sequences(self, parity_fsm: FSM) -> None:
+        """Test batch runs with sequences of different lengths."""
+        assert parity_fsm.run_batch([["1"], [], ["1", "1", "1"]]) == [
+            "Odd",
+            "Even",
+            "Odd",
+        ]
+
+    def test_run_batch_invalid_symbol(self, parity_fsm: FSM) -> None:
+        """Test batch runs reject invalid input symbols."""
+        with pytest.raises(ValueError, match="Invalid input symbol: 2"):
+            parity_fsm.run_batch([["0", "1"], ["1", "2"]])
+
+    def test_run_batch_undefined_transition(self) -> None:
+        """Test batch runs report the first undefined transition."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0", "1"},
+            transition_functions={("A", "0"): "B", ("B", "1"): "A"},
+            initial_state="A",
+        )
+        assert fsm.run_batch([["0", "1"], ["0"]]) == ["A", "B"]
+        with pytest.raises(ValueError, match="Transition \\(B, 0\\) not defined"):
+            fsm.run_batch([["0", "1"], ["0", "0"]])
+
+
+class TestLongRuns:
+    """Test long input sequences."""
+
+    def test_long_moore_run(self) -> None:
+        """Test a long Moore run matches the expected states and outputs."""
+        fsm = FSM(
+            states={"Red", "Yellow", "Green"},
+            alphabet={"Timer"},
+            transition_functions={
+                ("Red", "Timer"): "Green",
+                ("Green", "Timer"): "Yellow",
+                ("Yellow", "Timer"): "Red",
+            },
+            initial_state="Red",
+            state_outputs={"Red": "STOP", "Yellow": "CAUTION", "Green": "GO"},
+        )
+
+        assert fsm.run(["Timer"] * 1000) == "Green"
+        final_state, outputs = fsm.run(["Timer"] * 300, collect_outputs=True)
+        assert final_state == "Red"
+        assert outputs == ["STOP", "GO", "CAUTION"] * 100 + ["STOP"]
+
+    def test_long_mealy_run_undefined_transition(self) -> None:
+        """Test a long Mealy run reports an undefined transition."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0", "1"},
+            transition_functions={("A", "0"): "B", ("B", "0"): "A", ("B", "1"): "B"},
+            initial_state="A",
+            transition_outputs={("A", "0"): "X", ("B", "0"): "Y"},
+        )
+
+        final_state, outputs = fsm.run(["0"] * 400, collect_outputs=True)
+        assert final_state == "A"
+        assert outputs == ["X", "Y"] * 200 + [None]
+        with pytest.raises(ValueError, match="Transition \\(A, 1\\) not defined"):
+            fsm.run(["0"] * 400 + ["1"])
+
+
+class TestMinimize:
+    """Test DFA minimization."""
+
+    def test_minimize_merges_equivalent_states(self) -> None:
+        """Test equivalent states are merged and unreachable ones dropped."""
+        fsm = FSM(
+            states={"A", "B", "C", "D", "E"},
+            alphabet={"0", "1"},
+            transition_functions={
+                ("A", "0"): "B",
+                ("A", "1"): "C",
+                ("B", "0"): "D",
+                ("B", "1"): "D",
+                ("C", "0"): "D",
+                ("C", "1"): "D",
+                ("D", "0"): "D",
+                ("D", "1"): "D",
+                ("E", "0"): "A",
+            },
+            initial_state="A",
+            final_states={"D", "E"},
+        )
+
+        minimal = fsm.minimize()
+        assert minimal.states == {"A", "B", "D"}
+        assert minimal.final_states == {"D"}
+        for sequence in (["0"], ["1", "1"], ["0", "1", "0"], ["1", "0", "0", "1"]):
+            assert minimal.run(sequence) in {"A", "B", "D"}
+            assert (minimal.run(sequence) in minimal.final_states) == (
+                fsm.run(sequence) in fsm.final_states
+            )
+
+    def test_minimize_keeps_distinct_outputs(self) -> None:
+        """Test states with different Moore or Mealy outputs stay apart."""
+        moore = FSM(
+            states={"Red", "Yellow", "Green"},
+            alphabet={"Timer"},
+            transition_functions={
+                ("Red", "Timer"): "Green",
+                ("Green", "Timer"): "Yellow",
+                ("Yellow", "Timer"): "Red",
+            },
+            initial_state="Red",
+            state_outputs={"Red": "STOP", "Yellow": "CAUTION", "Green": "GO"},
+        )
+        assert moore.minimize().states == moore.states
+
+        mealy = FSM(
+            states={"A", "B"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B", ("B", "0"): "A"},
+            initial_state="A",
+            transition_outputs={("A", "0"): "X", ("B", "0"): "X"},
+        )
+        minimal = mealy.minimize()
+        assert minimal.states == {"A"}
+        assert minimal.run(["0", "0", "0"], collect_outputs=True) == (
+            "A",
+            ["X", "X", "X", None],
+        )
+
+    def test_minimize_keeps_mealy_outputs_of_reachable_steps(self) -> None:
+        """Test a Mealy FSM whose outputs are all unreachable stays Mealy."""
+        fsm = FSM(
+            states={"A", "B", "U"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B", ("B", "0"): "A", ("U", "0"): "A"},
+            initial_state="A",
+            state_outputs={"A": "y", "B": "y"},
+            transition_outputs={("U", "0"): "p"},
+        )
+        expected = ("A", [None, None, "y"])
+
+        assert fsm.run(["0", "0"], collect_outputs=True) == expected
+        assert fsm.minimize().run(["0", "0"], collect_outputs=True) == expected
+
+    def test_minimize_compares_outputs_by_type_and_value(self) -> None:
+        """Test unhashable outputs are accepted and 1 and True stay apart."""
+        params: Dict[str, Any] = {
+            "states": {"A", "B"},
+            "alphabet": {"0"},
+            "transition_functions": {("A", "0"): "B", ("B", "0"): "A"},
+            "initial_state": "A",
+        }
+        lists = FSM(**params, state_outputs={"A": ["x"], "B": ["x"]}, minimize=True)
+        assert lists.states == {"A"}
+        assert lists.run(["0"], collect_outputs=True) == ("A", [["x"], ["x"]])
+
+        fsm = FSM(**params, state_outputs={"A": 1, "B": True})
+        outputs = fsm.minimize().run(["0"], collect_outputs=True)[1]
+        assert [type(output) for output in outputs] == [int, bool]
+
+    def test_minimize_on_construction(self) -> None:
+        """Test FSMs can be minimized when they are built."""
+        fsm = FSM(
+            states={"A", "B", "C"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B", ("B", "0"): "C", ("C", "0"): "B"},
+            initial_state="A",
+            minimize=True,
+        )
+        assert fsm.states == {"A"}
+        assert fsm.run(["0", "0"]) == "A"
+
+
 class TestVisualization:
     """Test FSM visualization functionality."""
 
@@ -134,10 +369,231 @@ class TestVisualization:
             final_states={"B"},
         )
 
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            fsm.visualize(tmp.name)
-            assert os.path.exists(tmp.name)
-            os.unlink(tmp.name)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "fsm")
+            fsm.visualize(filename)
+            with open(f"{filename}.dot", encoding="utf-8") as file:
+                source = file.read()
+
+        assert source == fsm._dot_source(True)
+        assert '"B" [shape=doublecircle]' in source
+
+    def test_reachable_states(self) -> None:
+        """Test only states reachable from the initial state are found."""
+        fsm = FSM(
+            states={"A", "B", "C", "D"},
+            alphabet={"0", "1"},
+            transition_functions={
+                ("A", "0"): "B",
+                ("B", "1"): "A",
+                ("C", "0"): "D",
+                ("D", "0"): "A",
+            },
+            initial_state="A",
+        )
+
+        assert fsm._reachable_states() == {"A", "B"}
+
+    def test_dot_source_cached(self) -> None:
+        """Test the DOT source is built once per FSM and drawing mode."""
+        fsm = FSM(
+            states={"A", "B", "C"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B", ("C", "0"): "A"},
+            initial_state="A",
+        )
+
+        source = fsm._dot_source(reachable_only=True)
+        assert fsm._dot_source(reachable_only=True) is source
+        assert '"C"' not in source
+        assert '"C"' in fsm._dot_source(reachable_only=False)
+
+    def test_parallel_edges_merged(self) -> None:
+        """Test transitions between the same two states are drawn as one edge."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0", "1", "2"},
+            transition_functions={
+                ("A", "0"): "B",
+                ("A", "1"): "B",
+                ("A", "2"): "A",
+                ("B", "0"): "A",
+            },
+            initial_state="A",
+            transition_outputs={("A", "1"): "x"},
+        )
+
+        source = fsm._dot_source(reachable_only=True)
+        assert '"A" -> "B" [label="0, 1/ x"]' in source
+        assert '"A" -> "A" [label="2"]' in source
+        assert source.count("->") == 4
+
+    def test_dot_source_order(self) -> None:
+        """Test the DOT source lists the initial state first, then sorted."""
+        fsm = FSM(
+            states={"C", "A", "B"},
+            alphabet={"1", "0"},
+            transition_functions={
+                ("C", "1"): "A",
+                ("B", "0"): "C",
+                ("C", "0"): "B",
+                ("A", "1"): "C",
+            },
+            initial_state="C",
+        )
+
+        lines = fsm._dot_source(reachable_only=True).splitlines()
+        assert lines[4:] == [
+            '\t"C"',
+            '\t"A"',
+            '\t"B"',
+            '\tstart -> "C"',
+            '\t"C" -> "B" [label="0"]',
+            '\t"C" -> "A" [label="1"]',
+            '\t"A" -> "C" [label="1"]',
+            '\t"B" -> "C" [label="0"]',
+            "}",
+        ]
+
+    def test_render_cached(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test equal FSMs drawn in the same format are rendered once."""
+        renders = []
+
+        def fake_run(
+            args: List[str], **kwargs: Any
+        ) -> "subprocess.CompletedProcess[bytes]":
+            renders.append(args[1])
+            return subprocess.CompletedProcess(args, 0, stdout=b"image")
+
+        monkeypatch.setattr("dfsm.core.fsm._engine_path", lambda engine: engine)
+        monkeypatch.setattr(subprocess, "run", fake_run)
+        _render.cache_clear()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "fsm")
+            for _ in range(2):
+                FSM(
+                    states={"A", "B"},
+                    alphabet={"0"},
+                    transition_functions={("A", "0"): "B"},
+                    initial_state="A",
+                ).visualize(filename, render=True)
+            FSM(
+                states={"A", "B"},
+                alphabet={"0"},
+                transition_functions={("A", "0"): "B"},
+                initial_state="A",
+            ).visualize(filename, format="svg", render=True)
+
+            assert renders == ["-Tpng", "-Tsvg"]
+            with open(f"{filename}.png", "rb") as file:
+                assert file.read() == b"image"
+        _render.cache_clear()
+
+    def test_auto_engine(self) -> None:
+        """Test the automatic layout engine switches to sfdp for large FSMs."""
+        small = FSM(
+            states={"A", "B"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B"},
+            initial_state="A",
+        )
+        large = FSM(
+            states={f"S{i}" for i in range(60)},
+            alphabet={"next"},
+            transition_functions={
+                (f"S{i}", "next"): f"S{(i + 1) % 60}" for i in range(60)
+            },
+            initial_state="S0",
+        )
+
+        assert small._select_engine("auto", reachable_only=True) == "dot"
+        assert large._select_engine("auto", reachable_only=True) == "sfdp"
+        assert large._select_engine("neato", reachable_only=True) == "neato"
+
+    def test_missing_engine(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test drawing with a layout engine that is not installed."""
+        monkeypatch.setattr(shutil, "which", lambda engine: None)
+        _engine_path.cache_clear()
+        with pytest.raises(RuntimeError, match="'neato' not found"):
+            _engine_path("neato")
+        _engine_path.cache_clear()
+
+    def test_unknown_engine(self) -> None:
+        """Test only graphviz layout engines are run."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B"},
+            initial_state="A",
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "fsm")
+            with pytest.raises(ValueError, match="'true'"):
+                fsm.visualize(filename, engine="true", render=True)
+            with pytest.raises(ValueError, match="'true'"):
+                fsm.visualize_async(filename, engine="true", render=True)
+            assert not os.listdir(tmp_dir)
+        with pytest.raises(ValueError, match="'true'"):
+            _engine_path("true")
+
+    def test_visualize_without_render(self) -> None:
+        """Test visualize writes only the DOT source when not rendering."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B"},
+            initial_state="A",
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "fsm")
+            fsm.visualize(filename, render=False)
+            assert os.listdir(tmp_dir) == ["fsm.dot"]
+            with open(f"{filename}.dot", encoding="utf-8") as file:
+                assert file.read() == fsm._dot_source(reachable_only=True)
+
+    def test_visualize_creates_directories(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test visualize creates missing parent directories of the file."""
+        monkeypatch.setattr("dfsm.core.fsm._render", lambda *args: b"image")
+        fsm = FSM(
+            states={"A"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "A"},
+            initial_state="A",
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dot_name = os.path.join(tmp_dir, "out", "dot", "fsm")
+            image_name = os.path.join(tmp_dir, "out", "image", "fsm")
+            fsm.visualize(dot_name, render=False)
+            fsm.visualize(image_name, render=True)
+            assert os.path.exists(f"{dot_name}.dot")
+            assert os.path.exists(f"{image_name}.png")
+
+    def test_visualize_async(self) -> None:
+        """Test several FSMs drawn in the background are all written."""
+        fsms = [
+            FSM(
+                states={"A", "B"},
+                alphabet={symbol},
+                transition_functions={("A", symbol): "B"},
+                initial_state="A",
+            )
+            for symbol in ("0", "1", "2")
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            futures = [
+                fsm.visualize_async(os.path.join(tmp_dir, f"fsm{i}"))
+                for i, fsm in enumerate(fsms)
+            ]
+            for future in futures:
+                assert future.result() is None
+            assert sorted(os.listdir(tmp_dir)) == ["fsm0.dot", "fsm1.dot", "fsm2.dot"]
 
     def test_moore_visualization(self) -> None:
         """Test Moore machine visualization with state outputs."""
@@ -155,10 +611,14 @@ class TestVisualization:
             state_outputs={"Locked": "Red", "Unlocked": "Green"},
         )
 
-        with tempfile.NamedTemporaryFile(suffix=".svg", delete=False) as tmp:
-            fsm.visualize(tmp.name, format="svg")
-            assert os.path.exists(tmp.name)
-            os.unlink(tmp.name)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "fsm")
+            fsm.visualize(filename, format="svg")
+            with open(f"{filename}.dot", encoding="utf-8") as file:
+                source = file.read()
+
+        assert source == fsm._dot_source(True)
+        assert 'label="Locked/ Red"' in source
 
     def test_mealy_visualization(self) -> None:
         """Test Mealy machine visualization with transition outputs."""
@@ -180,10 +640,14 @@ class TestVisualization:
             },
         )
 
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            fsm.visualize(tmp.name)
-            assert os.path.exists(tmp.name)
-            os.unlink(tmp.name)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "fsm")
+            fsm.visualize(filename)
+            with open(f"{filename}.dot", encoding="utf-8") as file:
+                source = file.read()
+
+        assert source == fsm._dot_source(True)
+        assert '"A" -> "B" [label="0/ X"]' in source
 
 
 class TestFSMExamples:
@@ -1,63 +1,43 @@
 """Comprehensive tests for the FSM implementation."""
 
+import copy
 import os
+import pickle
+import subprocess
 import sys
-from typing import Dict, Set, Tuple
+from typing import Any, Dict
 
 import pytest
 
-# Add src to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
-# Import after path modification
-from dfsm.core.fsm import FSM  # noqa: E402
-from dfsm.models.fsm_model import FSMModel  # noqa: E402
+from dfsm.core.fsm import FSM, _compile
+from dfsm.models.fsm_model import FSMModel, validate_fsm
 
 
 class TestFSMBasic:
     """Basic FSM functionality tests."""
 
-    @pytest.fixture  # type: ignore[misc]
-    def simple_fsm_data(
-        self,
-    ) -> Tuple[Set[str], Set[str], Dict[Tuple[str, str], str], str, Set[str]]:
-        """Fixture for simple FSM test data."""
-        states = {"Locked", "Unlocked"}
-        alphabet = {"Coin", "Push"}
-        transition_functions = {
-            ("Locked", "Push"): "Locked",
-            ("Locked", "Coin"): "Unlocked",
-            ("Unlocked", "Push"): "Locked",
-            ("Unlocked", "Coin"): "Unlocked",
+    @pytest.fixture(scope="session")  # type: ignore[misc]
+    def simple_fsm_data(self) -> Dict[str, Any]:
+        """Fixture for simple FSM test data, shared by the whole session."""
+        return {
+            "states": {"Locked", "Unlocked"},
+            "alphabet": {"Coin", "Push"},
+            "transition_functions": {
+                ("Locked", "Push"): "Locked",
+                ("Locked", "Coin"): "Unlocked",
+                ("Unlocked", "Push"): "Locked",
+                ("Unlocked", "Coin"): "Unlocked",
+            },
+            "initial_state": "Locked",
+            "final_states": {"Unlocked"},
         }
-        initial_state = "Locked"
-        final_states = {"Unlocked"}
-        return states, alphabet, transition_functions, initial_state, final_states
-
-    @pytest.fixture  # type: ignore[misc]
-    def simple_fsm(
-        self,
-        simple_fsm_data: Tuple[
-            Set[str], Set[str], Dict[Tuple[str, str], str], str, Set[str]
-        ],
-    ) -> FSM:
-        """Fixture for simple FSM instance."""
-        (
-            states,
-            alphabet,
-            transition_functions,
-            initial_state,
-            final_states,
-        ) = simple_fsm_data
-        return FSM(
-            states=states,
-            alphabet=alphabet,
-            transition_functions=transition_functions,
-            initial_state=initial_state,
-            final_states=final_states,
-        )
 
-    def test_fsm_creation(self, simple_fsm_data: Dict) -> None:
+    @pytest.fixture(scope="session")  # type: ignore[misc]
+    def simple_fsm(self, simple_fsm_data: Dict[str, Any]) -> FSM:
+        """Fixture for simple FSM instance, built once; tests only read it."""
+        return FSM(**simple_fsm_data)
+
+    def test_fsm_creation(self, simple_fsm_data: Dict[str, Any]) -> None:
         """Test that FSM can be created with valid parameters."""
         fsm = FSM(**simple_fsm_data)
 
@@ -269,6 +249,35 @@ class TestFSMModelValidation:
         ):
             model.validate_transitions()
 
+    def test_empty_required_fields(self) -> None:
+        """Test validation fails with empty states, alphabet or initial state."""
+        with pytest.raises(ValueError, match="States set must not be empty"):
+            FSMModel(
+                states=frozenset(),
+                alphabet=frozenset({"0"}),
+                transition_functions={},
+                initial_state="A",
+            )
+        with pytest.raises(ValueError, match="Alphabet must not be empty"):
+            FSMModel(
+                states=frozenset({"A"}),
+                alphabet=frozenset(),
+                transition_functions={},
+                initial_state="A",
+            )
+        with pytest.raises(ValueError, match="Initial state must not be empty"):
+            FSM(states={"A"}, alphabet={"0"}, transition_functions={}, initial_state="")
+
+    def test_validate_fsm(self) -> None:
+        """Test validating FSM parameters directly, without a model."""
+        validate_fsm({"A", "B"}, {"0"}, {("A", "0"): "B"}, "A", final_states={"B"})
+        with pytest.raises(ValueError, match="Final state 'C' not in states set"):
+            validate_fsm({"A", "B"}, {"0"}, {("A", "0"): "B"}, "A", final_states={"C"})
+        with pytest.raises(
+            ValueError, match="State 'C' in state_outputs not in states set"
+        ):
+            validate_fsm({"A"}, {"0"}, {}, "A", state_outputs={"C": "x"})
+
 
 class TestFSMEdgeCases:
     """Test FSM edge cases and error conditions."""
@@ -350,6 +359,155 @@ class TestFSMEdgeCases:
         with pytest.raises(ValueError, match="Invalid input symbol: 2"):
             fsm.run(["0", "2", "1"])
 
+    def test_import_skips_optional_accelerators(self) -> None:
+        """Test importing the FSM module does not load heavy optional packages."""
+        code = (
+            "import sys, dfsm.core.fsm; "
+            "print(sorted({'numba', 'numpy', 'graphviz'} & set(sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip() == "[]"
+
+    def test_equal_fsms_share_compiled_tables(self) -> None:
+        """Test structurally equal FSMs reuse tables and expose them read-only."""
+        params: Dict[str, Any] = {
+            "states": {"A", "B"},
+            "alphabet": {"0"},
+            "transition_functions": {("A", "0"): "B", ("B", "0"): "A"},
+            "initial_state": "A",
+        }
+        first = FSM(**params)
+        second = FSM(**params)
+
+        assert first._compiled is second._compiled
+        assert first.states is second.states
+        with pytest.raises(TypeError):
+            first.transition_functions[("A", "0")] = "A"  # type: ignore[index]
+        assert second.transition_functions[("A", "0")] == "B"
+
+    def test_equal_outputs_of_other_types_not_shared(self) -> None:
+        """Test FSMs with equal outputs of different types keep their own."""
+        params: Dict[str, Any] = {
+            "states": {"A"},
+            "alphabet": {"0"},
+            "transition_functions": {("A", "0"): "A"},
+            "initial_state": "A",
+        }
+        first = FSM(**params, state_outputs={"A": 1})
+        second = FSM(**params, state_outputs={"A": True})
+        mealy = FSM(**params, transition_outputs={("A", "0"): 1.0})
+
+        assert first._compiled is second._compiled is mealy._compiled
+        assert first.run(["0"], collect_outputs=True) == ("A", [1, 1])
+        assert second.get_output("A") is True
+        assert second.run(["0"], collect_outputs=True)[1] == [True, True]
+        assert type(mealy.get_output("A", "0")) is float
+        with pytest.raises(TypeError):
+            second.state_outputs["A"] = False  # type: ignore[index]
+
+    def test_run_tables_built_on_first_use(self) -> None:
+        """Test the tables for running an FSM are only built when it runs."""
+        _compile.cache_clear()
+        fsm = FSM(
+            states={"Idle", "Busy"},
+            alphabet={"start"},
+            transition_functions={("Idle", "start"): "Busy"},
+            initial_state="Idle",
+        )
+        compiled = vars(fsm._compiled)
+
+        assert "table" not in compiled
+        assert "run_specialized" not in compiled
+        assert fsm.run(["start"]) == "Busy"
+        assert "run_specialized" in compiled
+        assert "table" not in compiled
+        assert fsm._out_table is None
+
+    def test_pickle_and_deepcopy(self) -> None:
+        """Test FSMs survive pickling and deep copies."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "B", ("B", "0"): "A"},
+            initial_state="A",
+            final_states={"B"},
+            state_outputs={"A": 1, "B": True},
+            transition_outputs={("A", "0"): ["x"]},
+        )
+        fsm.run(["0"], collect_outputs=True)
+
+        for copied in (pickle.loads(pickle.dumps(fsm)), copy.deepcopy(fsm)):
+            assert copied is not fsm
+            assert copied.transition_functions == fsm.transition_functions
+            assert copied.final_states == fsm.final_states
+            assert copied.state_outputs == fsm.state_outputs
+            assert copied.transition_outputs == fsm.transition_outputs
+            assert copied.run(["0", "0"], collect_outputs=True) == fsm.run(
+                ["0", "0"], collect_outputs=True
+            )
+            assert copied.get_output("B") is True
+
+    def test_fsm_has_no_instance_dict(self) -> None:
+        """Test FSM attributes are stored in slots."""
+        fsm = FSM(
+            states={"A"},
+            alphabet={"0"},
+            transition_functions={("A", "0"): "A"},
+            initial_state="A",
+        )
+
+        assert not hasattr(fsm, "__dict__")
+        with pytest.raises(AttributeError):
+            fsm.extra = 1  # type: ignore[attr-defined]
+
+    def test_names_interned(self) -> None:
+        """Test state and symbol names built at runtime are interned."""
+        state = "".join(["Sta", "rt"])
+        symbol = "".join(["g", "o"])
+        fsm = FSM(
+            states={state},
+            alphabet={symbol},
+            transition_functions={(state, symbol): state},
+            initial_state=state,
+        )
+
+        assert fsm.initial_state is sys.intern("Start")
+        assert next(iter(fsm.alphabet)) is sys.intern("go")
+        assert fsm.run(["go"]) == "Start"
+
+    def test_ring_fsm_above_byte_table_size(self) -> None:
+        """Test an FSM with too many states for a byte transition table."""
+        fsm = FSM(
+            states={f"S{i}" for i in range(300)},
+            alphabet={"next"},
+            transition_functions={
+                (f"S{i}", "next"): f"S{(i + 1) % 300}" for i in range(300)
+            },
+            initial_state="S0",
+        )
+        assert not isinstance(fsm._compiled.table[0], bytearray)
+        assert fsm.run(["next"] * 305) == "S5"
+        assert list(fsm.run_iter(["next"] * 3))[-1] == ("S3", None)
+
+    def test_run_undefined_transition(self) -> None:
+        """Test running a partial FSM into an undefined transition."""
+        fsm = FSM(
+            states={"A", "B"},
+            alphabet={"0", "1"},
+            transition_functions={("A", "0"): "B", ("B", "1"): "A"},
+            initial_state="A",
+        )
+        assert fsm.run(["0", "1", "0"]) == "B"
+        with pytest.raises(ValueError, match="Transition \\(B, 0\\) not defined"):
+            fsm.run(["0", "0"])
+
 
 if __name__ == "__main__":
     pytest.main([__file__])